@@ -1,6 +1,11 @@
 import re
 import logging
-from typing import Dict, Any, List
+from collections import namedtuple
+from typing import Dict, Any, Iterable, List, Sequence
+
+# A generated fact kept alongside its structured parts, so validation does
+# not need to parse the formatted Prolog text back apart
+PrologFact = namedtuple('PrologFact', 'predicate args text')
 
 
 class AdvancedCKDKnowledgeBaseGenerator:
@@ -32,25 +37,44 @@ class AdvancedCKDKnowledgeBaseGenerator:
                 'treatment_plan', 'medical_expenses'
             ]
         }
+        self._schema_arities = {
+            predicate: len(schema) for predicate, schema in self.predicate_schemas.items()
+        }
+
+        # Extraction patterns, each paired with a lowercase literal that every
+        # match must contain. normalize_input only runs the regexes whose
+        # literal occurs in the text. They run independently rather than as
+        # one fused alternation: finditer never returns overlapping matches,
+        # so a field overlapping an earlier match would be lost.
+        extraction_patterns = [
+            ('old', r'(?P<full_name>\w+)\s+is\s+a\s+(?P<age>\d+)\s+years?\s+old\s+(?P<gender>\w+)'),
+            ('income', r'monthly\s+income\s+is\s+(?P<monthly_income>\d+)'),
+            ('stage', r'stage\s+(?P<ckd_stage>\d+)\s+CKD'),
+            ('lives', r'lives\s+in\s+(?P<residence_type>\w+)')
+        ]
+        self._pattern_specs = [
+            (literal, re.compile(pattern, re.IGNORECASE))
+            for literal, pattern in extraction_patterns
+        ]
 
-    def validate_fact(self, predicate: str, arguments: List[Any]) -> bool:
+    def validate_fact(self, predicate: str, arguments: Sequence[Any]) -> bool:
         """
         Validate a Prolog fact against predefined schemas.
 
         Args:
             predicate (str): Name of the predicate
-            arguments (List[Any]): Arguments to validate
+            arguments (Sequence[Any]): Arguments to validate
 
         Returns:
             bool: Whether the fact is valid
         """
-        if predicate not in self.predicate_schemas:
+        expected_arity = self._schema_arities.get(predicate)
+
+        if expected_arity is None:
             logging.warning(f"Unknown predicate: {predicate}")
             return False
 
-        schema = self.predicate_schemas[predicate]
-
-        if len(arguments) != len(schema):
+        if len(arguments) != expected_arity:
             logging.warning(f"Argument count mismatch for {predicate}")
             return False
 
@@ -69,25 +93,20 @@ class AdvancedCKDKnowledgeBaseGenerator:
         Returns:
             Dict[str, Any]: Structured patient information
         """
-        # Comprehensive extraction patterns
-        patterns = [
-            (r'(\w+)\s+is\s+a\s+(\d+)\s+years?\s+old\s+(\w+)',
-             ['full_name', 'age', 'gender']),
-            (r'monthly\s+income\s+is\s+(\d+)', ['monthly_income']),
-            (r'stage\s+(\d+)\s+CKD', ['ckd_stage']),
-            (r'lives\s+in\s+(\w+)', ['residence_type'])
-        ]
+        lowered_text = input_text.lower()
 
         normalized_data = {}
-        for pattern, keys in patterns:
-            match = re.search(pattern, input_text, re.IGNORECASE)
+        for literal, pattern in self._pattern_specs:
+            # Skip the regex when its trigger word is absent
+            if literal not in lowered_text:
+                continue
+            match = pattern.search(input_text)
             if match:
-                for i, key in enumerate(keys):
-                    normalized_data[key] = match.group(i + 1)
+                normalized_data.update(match.groupdict())
 
         return normalized_data
 
-    def generate_prolog_facts(self, patient_info: Dict[str, Any]) -> List[str]:
+    def generate_prolog_facts(self, patient_info: Dict[str, Any]) -> List[PrologFact]:
         """
         Generate standardized Prolog facts from patient information.
 
@@ -95,17 +114,52 @@ class AdvancedCKDKnowledgeBaseGenerator:
             patient_info (Dict[str, Any]): Extracted patient details
 
         Returns:
-            List[str]: Standardized Prolog facts
+            List[PrologFact]: Standardized Prolog facts with their predicate and arguments
         """
-        # Generate unique ID (could be more sophisticated)
-        unique_id = patient_info.get('full_name', 'unknown').lower().replace(' ', '_')
+        full_name = patient_info.get('full_name')
+
+        # Every fact is keyed on the patient ID, so nothing can be generated without a name
+        if full_name is None:
+            return []
 
+        # Generate unique ID (could be more sophisticated)
+        unique_id = full_name.lower().replace(' ', '_')
+        ckd_stage = patient_info.get('ckd_stage')
+        monthly_income = patient_info.get('monthly_income')
+        residence_type = patient_info.get('residence_type')
+
+        patient_args = (
+            unique_id,
+            f"'{full_name}'",
+            patient_info.get('age', 0),
+            patient_info.get('gender', 'unknown'),
+            'sri_lankan'
+        )
         facts = [
-            f"patient({unique_id}, '{patient_info.get('full_name', 'Unknown')}', {patient_info.get('age', 0)}, {patient_info.get('gender', 'unknown')}, sri_lankan).",
-            f"health_condition({unique_id}, chronic_kidney_disease, {patient_info.get('ckd_stage', 0)}).",
-            f"socio_economic_profile({unique_id}, {patient_info.get('monthly_income', 0)}, unknown, {patient_info.get('residence_type', 'unknown')}, 0, unknown)."
+            PrologFact('patient', patient_args,
+                       "patient({}, {}, {}, {}, {}).".format(*patient_args))
         ]
 
+        # Skip the remaining facts when the details they describe were not extracted
+        if ckd_stage is not None:
+            health_args = (unique_id, 'chronic_kidney_disease', ckd_stage)
+            facts.append(PrologFact('health_condition', health_args,
+                                    "health_condition({}, {}, {}).".format(*health_args)))
+
+        # The profile also carries the residence, so it is emitted when either is
+        # known; the missing one uses the same placeholder as the unknown columns
+        if monthly_income is not None or residence_type is not None:
+            socio_economic_args = (
+                unique_id,
+                monthly_income if monthly_income is not None else 'unknown',
+                'unknown',
+                residence_type if residence_type is not None else 'unknown',
+                0,
+                'unknown'
+            )
+            facts.append(PrologFact('socio_economic_profile', socio_economic_args,
+                                    "socio_economic_profile({}, {}, {}, {}, {}, {}).".format(*socio_economic_args)))
+
         return facts
 
     def process_patient_description(self, description: str) -> List[str]:
@@ -127,11 +181,8 @@ class AdvancedCKDKnowledgeBaseGenerator:
 
             # Validate facts
             validated_facts = [
-                fact for fact in prolog_facts
-                if self.validate_fact(
-                    fact.split('(')[0],
-                    fact.split('(')[1].strip(').').split(',')
-                )
+                fact.text for fact in prolog_facts
+                if self.validate_fact(fact.predicate, fact.args)
             ]
 
             logging.info(f"Processed patient description: {validated_facts}")
@@ -141,6 +192,18 @@ class AdvancedCKDKnowledgeBaseGenerator:
             logging.error(f"Error processing description: {e}")
             return []
 
+    def process_descriptions(self, descriptions: Iterable[str]) -> List[List[str]]:
+        """
+        Process a batch of patient descriptions.
+
+        Args:
+            descriptions (Iterable[str]): Natural language patient descriptions
+
+        Returns:
+            List[List[str]]: Validated Prolog facts for each description, in input order
+        """
+        return [self.process_patient_description(description) for description in descriptions]
+
 
 def main():
     """
@@ -1,6 +1,146 @@
 import streamlit as st
 from pl_converter_3 import AdvancedPrologKnowledgeBaseGenerator
 import re
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Validation patterns and allowed values, compiled once at import
+_ALPHA_RE = re.compile(r'^[A-Za-z\s]+$')
+_HEALTH_CONDITION_RE = re.compile(r'^[A-Za-z0-9\s]+$')
+
+_GENDERS = frozenset(['male', 'female', 'other'])
+_YES_NO = frozenset(['yes', 'no'])
+_EDUCATION_LEVELS = frozenset(['primary', 'secondary', 'high school', 'bachelor', 'master', 'phd'])
+_FAMILY_STRUCTURES = frozenset(['nuclear', 'extended', 'single'])
+
+# Prolog term conversion: spaces become underscores and quotes are dropped
+_PROLOG_TERM_TRANS = str.maketrans({' ': '_', "'": None, '"': None})
+_PROLOG_ATOM_RE = re.compile(r'[a-z0-9_]+')
+
+# Name argument of a person/1 fact
+_PERSON_RE = re.compile(r'^person\(([^)]+)\)')
+
+
+# Validators are pure functions of their input. Streamlit reruns the script
+# on every widget interaction, so the regex-based ones are memoized.
+@lru_cache(maxsize=1024)
+def _validate_alpha_min2(value):
+    """Validate letters-and-spaces input of at least two characters."""
+    return bool(_ALPHA_RE.match(str(value))) and len(str(value)) >= 2
+
+
+# Names, locations and professions share one rule and one cache
+_validate_name = _validate_location = _validate_profession = _validate_alpha_min2
+
+
+@lru_cache(maxsize=512)
+def _validate_age(age):
+    """Validate patient age."""
+    try:
+        age = int(age)
+        return 0 < age < 120
+    except ValueError:
+        return False
+
+
+def _validate_gender(gender):
+    """Validate gender input."""
+    return str(gender).lower() in _GENDERS
+
+
+@lru_cache(maxsize=512)
+def _validate_income(income):
+    """Validate monthly income."""
+    try:
+        income = float(income)
+        return income >= 0
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=512)
+def _validate_health_condition(condition):
+    """Validate health condition input."""
+    return bool(_HEALTH_CONDITION_RE.match(str(condition))) and len(str(condition)) >= 2
+
+
+def _validate_yes_no(response):
+    """Validate yes/no responses."""
+    return str(response).lower() in _YES_NO
+
+
+def _validate_education(education):
+    """Validate education level input."""
+    return str(education).lower() in _EDUCATION_LEVELS
+
+
+def _validate_family_structure(structure):
+    """Validate family structure input."""
+    return str(structure).lower() in _FAMILY_STRUCTURES
+
+
+def extract_person_name(facts):
+    """Return the name from the first person/1 fact, or None if there is none."""
+    for fact in facts:
+        match = _PERSON_RE.match(fact)
+        if match:
+            return match.group(1)
+    return None
+
+
+# Fact extraction is one LLM round trip and the slowest step of a submission.
+# It depends only on the description, so identical descriptions reuse it; the
+# leading underscore keeps Streamlit from hashing the generator itself.
+@st.cache_data(show_spinner="Extracting facts…", ttl=24 * 60 * 60)
+def _extract_facts(_knowledge_generator, prolog_file_path, patient_description):
+    """Return the Prolog facts proposed for a description, before any user confirmation."""
+    facts = _knowledge_generator.extract_advanced_knowledge(patient_description)
+    # The extractor returns no facts when the LLM call fails. Streamlit does not
+    # cache exceptions, so raising keeps a transient failure from being replayed.
+    if not facts:
+        raise ValueError("No facts could be extracted from the description.")
+    return facts
+
+
+# Critical attributes with comprehensive validation. Defined once at import
+# so Streamlit reruns do not rebuild it.
+CRITICAL_ATTRIBUTES = {
+    'location': {
+        'prompt': "Province or District",
+        'type': 'text',
+        'validator': _validate_alpha_min2
+    },
+    'family_structure': {
+        'prompt': "Family Structure",
+        'type': 'select',
+        'options': ['nuclear', 'extended', 'single'],
+        'validator': _validate_family_structure
+    },
+    'education': {
+        'prompt': "Highest Education Level",
+        'type': 'select',
+        'options': ['primary', 'secondary', 'high school', 'bachelor', 'master', 'phd'],
+        'validator': _validate_education
+    },
+    'profession': {
+        'prompt': "Current Occupation",
+        'type': 'text',
+        'validator': _validate_alpha_min2
+    },
+    'monthly_income': {
+        'prompt': "Monthly Income (LKR)",
+        'type': 'number',
+        'validator': _validate_income
+    },
+    'chronic_condition': {
+        'prompt': "Other Chronic Conditions",
+        'type': 'select',
+        'options': ['yes', 'no'],
+        'validator': _validate_yes_no
+    }
+}
 
 
 class CKDFinancialAidKnowledgeManager:
@@ -12,59 +152,30 @@ class CKDFinancialAidKnowledgeManager:
             prolog_file_path=prolog_file_path
         )
 
-        # Restore ALL critical attributes with comprehensive validation
-        self.critical_attributes = {
-            'location': {
-                'prompt': "Province or District",
-                'type': 'text',
-                'validator': self._validate_location
-            },
-            'family_structure': {
-                'prompt': "Family Structure",
-                'type': 'select',
-                'options': ['nuclear', 'extended', 'single'],
-                'validator': self._validate_family_structure
-            },
-            'education': {
-                'prompt': "Highest Education Level",
-                'type': 'select',
-                'options': ['primary', 'secondary', 'high school', 'bachelor', 'master', 'phd'],
-                'validator': self._validate_education
-            },
-            'profession': {
-                'prompt': "Current Occupation",
-                'type': 'text',
-                'validator': self._validate_profession
-            },
-            'monthly_income': {
-                'prompt': "Monthly Income (LKR)",
-                'type': 'number',
-                'validator': self._validate_income
-            },
-            'chronic_condition': {
-                'prompt': "Other Chronic Conditions",
-                'type': 'select',
-                'options': ['yes', 'no'],
-                'validator': self._validate_yes_no
-            }
-        }
-
-    def gather_missing_information(self, initial_facts):
+        self.critical_attributes = CRITICAL_ATTRIBUTES
+
+        # Flat (attribute, validator, prompt) rows for the submit path
+        self._validator_table = tuple(
+            (attr, details['validator'], details['prompt'])
+            for attr, details in self.critical_attributes.items()
+        )
+
+    def gather_missing_information(self, initial_facts, person_name=None):
         """
         Comprehensive method to gather missing patient information with enhanced state management.
+
+        Args:
+            initial_facts (list): Prolog facts extracted from the description
+            person_name (str, optional): Patient name, if already extracted by the caller
         """
-        # Debug: Print initial facts to verify input
-        print("Initial Facts Received:", initial_facts)
+        logger.debug("Initial Facts Received: %s", initial_facts)
 
         # Use Streamlit's session state to maintain persistent information
         if 'patient_missing_info' not in st.session_state:
             st.session_state.patient_missing_info = {}
 
-        # Identify the patient name from initial facts
-        person_name = next(
-            (fact.split('(')[1].split(')')[0] for fact in initial_facts if fact.startswith('person(')),
-            None
-        )
+        if person_name is None:
+            person_name = extract_person_name(initial_facts)
 
         if not person_name:
             st.error("Could not identify patient name from initial facts.")
@@ -74,16 +185,15 @@ class CKDFinancialAidKnowledgeManager:
 
         # Wrap the entire information gathering in a form to prevent unexpected reloads
         with st.form(key=f"additional_info_form_{person_name}", clear_on_submit=False):
-            # Debug: Print current session state
-            st.write("Current Session State:", st.session_state.patient_missing_info)
-
             # Track missing attributes
+            present_predicates = {fact.partition('(')[0] for fact in initial_facts}
             missing_attrs = [
-                attr for attr, details in self.critical_attributes.items()
-                if not any(attr in fact for fact in initial_facts)
+                attr for attr in self.critical_attributes
+                if attr not in present_predicates
             ]
 
-            st.write(f"Missing Attributes: {missing_attrs}")  # Explicit debug print
+            logger.debug("Current Session State: %s", st.session_state.patient_missing_info)
+            logger.debug("Missing Attributes: %s", missing_attrs)
 
             # Information gathering for each missing attribute
             for attr in missing_attrs:
@@ -126,18 +236,18 @@ class CKDFinancialAidKnowledgeManager:
             if submitted:
                 # Validation logic
                 validated_info = {}
-                for attr, value in st.session_state.patient_missing_info.items():
-                    details = self.critical_attributes[attr]
+                for attr, validator, prompt in self._validator_table:
+                    value = st.session_state.patient_missing_info.get(attr)
 
                     # Skip validation for empty/zero values
                     if value is None or (isinstance(value, (int, float)) and value == 0):
                         continue
 
                     # Validate each attribute
-                    if details['validator'](value):
+                    if validator(value):
                         validated_info[attr] = value
                     else:
-                        st.warning(f"Invalid input for {details['prompt']}. Please check your entry.")
+                        st.warning(f"Invalid input for {prompt}. Please check your entry.")
 
                 # Return validated information or current session state
                 return validated_info if validated_info else st.session_state.patient_missing_info
@@ -149,13 +259,14 @@ class CKDFinancialAidKnowledgeManager:
     def add_patient_information(self, patient_description, interactive=True):
         try:
             # Extract initial knowledge
-            initial_facts = self.knowledge_generator.extract_advanced_knowledge(patient_description)
+            initial_facts = _extract_facts(
+                self.knowledge_generator,
+                self.knowledge_generator.prolog_file_path,
+                patient_description
+            )
 
             # Identify the person's name from initial facts
-            person_name = next(
-                (fact.split('(')[1].split(')')[0] for fact in initial_facts if fact.startswith('person(')),
-                None
-            )
+            person_name = extract_person_name(initial_facts)
 
             if not person_name:
                 st.error("Could not identify patient name from initial facts.")
@@ -163,13 +274,11 @@ class CKDFinancialAidKnowledgeManager:
 
             # If interactive mode is on, gather missing information
             if interactive:
-                # Debug: Print initial facts before gathering additional info
-                print("Initial Facts Before Additional Info:", initial_facts)
+                logger.debug("Initial Facts Before Additional Info: %s", initial_facts)
 
-                additional_info = self.gather_missing_information(initial_facts)
+                additional_info = self.gather_missing_information(initial_facts, person_name)
 
-                # Debug: Print additional information gathered
-                print("Additional Information Gathered:", additional_info)
+                logger.debug("Additional Information Gathered: %s", additional_info)
 
                 # If additional information was gathered, create explicit Prolog facts
                 if additional_info:
@@ -180,17 +289,15 @@ class CKDFinancialAidKnowledgeManager:
                         if value is not None and value != ''
                     ]
 
-                    # Debug: Print additional facts being added
-                    print("Additional Facts to Add:", additional_facts)
+                    logger.debug("Additional Facts to Add: %s", additional_facts)
 
                     # Combine initial and additional facts, removing duplicates
-                    final_facts = list(set(initial_facts + additional_facts))
+                    final_facts = list(dict.fromkeys((*initial_facts, *additional_facts)))
 
                     # Add ALL facts to the knowledge base
                     self.knowledge_generator.add_to_knowledge_base(final_facts)
 
-                    # Debug: Print final facts being saved
-                    print("Final Facts Saved:", final_facts)
+                    logger.debug("Final Facts Saved: %s", final_facts)
 
                     return final_facts
                 else:
@@ -223,57 +330,19 @@ class CKDFinancialAidKnowledgeManager:
         """
         # Convert to lowercase and replace spaces with underscores
         if isinstance(value, str):
+            # Values from the select boxes are already valid atoms
+            if _PROLOG_ATOM_RE.fullmatch(value):
+                return value
             # Remove quotes, convert to lowercase, replace spaces with underscores
-            return value.lower().replace(' ', '_').strip("'\"")
+            return value.lower().translate(_PROLOG_TERM_TRANS)
 
         # For numeric values, convert to string
         return str(value).lower()
-    def _validate_name(self, name):
-        """Validate patient name."""
-        return bool(re.match(r'^[A-Za-z\s]+$', str(name))) and len(str(name)) >= 2
 
-    def _validate_age(self, age):
-        """Validate patient age."""
-        try:
-            age = int(age)
-            return 0 < age < 120
-        except ValueError:
-            return False
 
-    def _validate_gender(self, gender):
-        """Validate gender input."""
-        return str(gender).lower() in ['male', 'female', 'other']
-
-    def _validate_location(self, location):
-        """Validate location input."""
-        return bool(re.match(r'^[A-Za-z\s]+$', str(location))) and len(str(location)) >= 2
-
-    def _validate_profession(self, profession):
-        """Validate profession input."""
-        return bool(re.match(r'^[A-Za-z\s]+$', str(profession))) and len(str(profession)) >= 2
-
-    def _validate_income(self, income):
-        """Validate monthly income."""
-        try:
-            income = float(income)
-            return income >= 0
-        except ValueError:
-            return False
-
-    def _validate_health_condition(self, condition):
-        """Validate health condition input."""
-        return bool(re.match(r'^[A-Za-z0-9\s]+$', str(condition))) and len(str(condition)) >= 2
-
-    def _validate_yes_no(self, response):
-        """Validate yes/no responses."""
-        return str(response).lower() in ['yes', 'no']
-
-    def _validate_education(self, education):
-        """Validate education level input."""
-        valid_levels = ['primary', 'secondary', 'high school', 'bachelor', 'master', 'phd']
-        return str(education).lower() in valid_levels
-
-    def _validate_family_structure(self, structure):
-        """Validate family structure input."""
-        valid_structures = ['nuclear', 'extended', 'single']
-        return str(structure).lower() in valid_structures
\ No newline at end of file
+@st.cache_resource
+def get_manager(prolog_file_path='ckd_financial_aid.pl'):
+    """
+    Return a knowledge manager shared across Streamlit reruns and sessions.
+    """
+    return CKDFinancialAidKnowledgeManager(prolog_file_path)
@@ -1,23 +1,280 @@
 #pl_converter_3.py
 import os
 import re
+import atexit
+import asyncio
 import logging
-from typing import List, Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import List, Dict, Any, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
 
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
+from langchain_core.globals import set_llm_cache
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_community.cache import SQLiteCache
+from tenacity import AsyncRetrying, retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 
 import openai
 
+# Fact extraction pattern, matched against each candidate line of LLM output:
+# - Allow for single quotes around strings (e.g., 'Nimal Perera', 'hypertension')
+# - Supports multi-word arguments with underscores (e.g., stage_4_ckd, colombo)
+# - Ensures lowercase start for predicates and arguments
+# - Requires period at the end of each fact
+_FACT_RE = re.compile(
+    r'^[a-z][a-z0-9_]*\((?:[a-z0-9_]+(?:_[a-z0-9_]+)*|\'[^\']+\')(?:,\s*(?:[a-z0-9_]+(?:_[a-z0-9_]+)*|\'[^\']+\'))*\)\.$',
+    re.MULTILINE
+)
+
+# Stricter pattern for facts written to the knowledge base (unquoted atoms and numbers only)
+_VALIDATE_RE = re.compile(
+    r'^[a-z][a-z0-9_]*\([a-z0-9_]+(?:_[a-z0-9_]+)*(?:,\s*[a-z0-9_]+(?:_[a-z0-9_]+)*)*\)\.$',
+    re.MULTILINE
+)
+
+# Individual argument terms inside a fact matched by _FACT_RE
+_FACT_ARG_RE = re.compile(r"'[^']+'|[a-z0-9_]+")
+
+# Sentence boundaries used to split long descriptions into chunks
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Predicates allowed by the controlled vocabulary
+_VALID_PREDICATES = frozenset([
+    'person', 'age', 'gender', 'profession', 'marital_status', 'education',
+    'health_condition', 'chronic_condition', 'disability', 'resides_in',
+    'location', 'children', 'monthly_income', 'income_level', 'fixed_income',
+    'debt_status', 'communication_preference', 'access_to_healthcare', 'language_spoken',
+    'family_structure', 'dependent_children', 'elderly_dependents', 'commute_time'
+])
+
+# Rule-based fast path for structured inputs such as "Name: Nimal Perera. Age: 45."
+_RULE_FIELD_RE = re.compile(
+    r'([A-Za-z][A-Za-z _]*?)\s*[:=]\s*((?:(?:LKR|Rs\.?)\s*)?\d{1,3}(?:,\d{3})+|[^.;,\n]+)'
+)
+# Values accepted for numeric fields: a plain or comma-grouped number with an
+# optional currency or unit, e.g. "LKR 25,000", "45 years"
+_RULE_NUMBER_RE = re.compile(
+    r'(?:(?:LKR|Rs\.?)\s*)?(\d{1,3}(?:,\d{3})+|\d+)(?:\s*(?:LKR|rupees|years?(?:\s+old)?))?',
+    re.IGNORECASE
+)
+_RULE_PHRASE_PATTERNS = [
+    (re.compile(r'\baged\s+(\d+)', re.IGNORECASE), 'age'),
+    (re.compile(r'\blives\s+in\s+([A-Za-z][A-Za-z ]*?)(?=[.,;\n]|$)', re.IGNORECASE), 'location')
+]
+
+# Field labels accepted by the rule-based extractor, mapped to predicates
+_RULE_FIELD_PREDICATES = {
+    'name': 'person', 'full_name': 'person', 'patient': 'person', 'patient_name': 'person',
+    'age': 'age',
+    'gender': 'gender', 'sex': 'gender',
+    'location': 'location', 'province': 'location', 'district': 'location', 'city': 'location',
+    'profession': 'profession', 'occupation': 'profession', 'job': 'profession',
+    'marital_status': 'marital_status',
+    'education': 'education',
+    'ckd_stage': 'health_condition', 'stage': 'health_condition', 'health_condition': 'health_condition',
+    'chronic_condition': 'chronic_condition',
+    'disability': 'disability',
+    'residence': 'resides_in', 'resides_in': 'resides_in',
+    'children': 'children',
+    'dependent_children': 'dependent_children',
+    'elderly_dependents': 'elderly_dependents',
+    'family_structure': 'family_structure',
+    'monthly_income': 'monthly_income', 'income': 'monthly_income',
+    'access_to_healthcare': 'access_to_healthcare',
+    'language': 'language_spoken', 'language_spoken': 'language_spoken'
+}
+_RULE_NUMERIC_PREDICATES = frozenset([
+    'age', 'children', 'dependent_children', 'elderly_dependents', 'monthly_income', 'commute_time'
+])
+
+# Minimum attribute facts (besides person/1) before the LLM call is skipped
+_RULE_MIN_MATCHES = 3
+
+# Controlled vocabulary shared by the extraction prompts, one predicate signature per line
+_CONTROLLED_VOCABULARY = """Controlled Vocabulary (predicate: allowed values):
+person(Name)
+age(Person, Age): integer years
+gender(Person, Gender): male | female | other
+profession(Person, Job): e.g. teacher, farmer
+marital_status(Person, Status): e.g. single, married, divorced
+education(Person, Level): e.g. primary, secondary, high_school, bachelor, phd
+health_condition(Person, Condition): e.g. stage_4_ckd, hypertension
+chronic_condition(Person, YesNo): yes | no
+disability(Person, YesNo): yes | no
+resides_in(Person, Area): urban | rural
+location(Person, Place): province or town, e.g. colombo, kandy
+commute_time(Person, Minutes): integer
+children(Person, Count): integer
+dependent_children(Person, Count): integer, children under 18
+elderly_dependents(Person, Count): integer
+family_structure(Person, Structure): nuclear | extended | single
+monthly_income(Person, Amount): integer LKR
+income_level(Person, Level): low | middle | high
+fixed_income(Person, YesNo): yes | no
+debt_status(Person, YesNo): yes | no
+communication_preference(Person, Medium): e.g. phone, email
+access_to_healthcare(Person, YesNo): yes | no
+language_spoken(Person, Language): e.g. sinhala, tamil, english"""
+
+_FACT_INSTRUCTIONS = """Rules:
+- Use only the predicates above, no synonyms, and only the listed values where given.
+- Write atoms in lowercase with underscores (e.g. nimal_perera). Translate non-English input first.
+- Output one fact per line ending with a period, e.g. age(nimal_perera, 45).
+- Output only the facts, with no other text."""
+
+_REFINEMENT_OBJECTIVES = """1. Eliminate redundant or semantically equivalent facts
+2. Infer potential missing relationships
+3. Ensure logical consistency and secure integrity
+4. Standardize predicate naming and formatting
+
+Constraints:
+- Maintain original semantic meaning
+- Prefer more specific predicates
+- Remove overly generic facts
+- Add contextual relationships if possible"""
+
+# System messages are kept byte-identical across calls, with the variable
+# input sent as a separate user turn, so provider prompt caching can reuse
+# the shared prefix
+_EXTRACTION_SYSTEM_PROMPT = f"""Extract Prolog facts about the person described in the user message.
+
+{_CONTROLLED_VOCABULARY}
+
+{_FACT_INSTRUCTIONS}"""
+
+_REFINEMENT_SYSTEM_PROMPT = f"""Knowledge Refinement Process:
+
+Refine the Prolog facts provided by the user with these objectives:
+{_REFINEMENT_OBJECTIVES}
+
+Respond with the refined knowledge base."""
+
+_COMBINED_SYSTEM_PROMPT = f"""Extract refined Prolog facts about the person described in the user message.
+
+{_CONTROLLED_VOCABULARY}
+
+{_FACT_INSTRUCTIONS}
+
+Before answering, refine the facts: drop redundant ones, keep the original meaning,
+prefer specific predicates, and add relationships clearly implied by the text."""
+
+
+# Provider errors that are worth retrying: rate limits, dropped connections and timeouts, server errors
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError
+)
+
+
+# Backoff policy shared by the sync and async invocation helpers
+_RETRY_POLICY = dict(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential(multiplier=1, min=2, max=30),
+    retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+    reraise=True
+)
+
+
+@retry(**_RETRY_POLICY)
+def _invoke_with_retry(chain, payload):
+    """Invoke a chain, backing off exponentially on transient provider errors."""
+    return chain.invoke(payload)
+
+
+async def _ainvoke_with_retry(chain, payload):
+    """Asynchronous variant of _invoke_with_retry."""
+    async for attempt in AsyncRetrying(**_RETRY_POLICY):
+        with attempt:
+            return await chain.ainvoke(payload)
+
+
+def _chunk_text(text: str, max_chars: int = 1500) -> List[str]:
+    """
+    Split text into chunks of whole sentences, each at most max_chars long.
+
+    A single sentence longer than max_chars becomes its own chunk.
+    """
+    chunks = []
+    current = ''
+    for sentence in _SENTENCE_SPLIT_RE.split(text.strip()):
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class Fact(NamedTuple):
+    """
+    A Prolog fact parsed once from LLM output.
+
+    Downstream validation, deduplication and file writes work on the
+    predicate and argument terms directly instead of re-running regexes.
+    """
+    predicate: str
+    args: Tuple[str, ...]
+
+    def to_prolog(self) -> str:
+        """Serialize the fact as a Prolog clause."""
+        return f"{self.predicate}({', '.join(self.args)})."
+
+
+def _parse_fact_line(line: str) -> Optional[Fact]:
+    """Parse one stripped output line into a Fact, or None if it is not a valid fact."""
+    predicate, _, arguments = line.partition('(')
+    if predicate in _VALID_PREDICATES and _FACT_RE.fullmatch(line):
+        return Fact(predicate, tuple(_FACT_ARG_RE.findall(arguments)))
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _parse_prolog_facts(llm_extraction: str) -> Tuple[Fact, ...]:
+    """
+    Extract the valid Prolog facts from raw LLM output.
+
+    Memoized on the output text; returns a tuple so cached results cannot be mutated by callers.
+    """
+    logging.debug("inside_parse: %s", llm_extraction)
+
+    # Cheap structural prefilter: most output lines are prose that cannot be a fact
+    potential_facts = [
+        line for line in (raw_line.strip() for raw_line in llm_extraction.splitlines())
+        if line.endswith(').') and line[:1].islower() and '(' in line
+    ]
+    logging.debug("potential_facts: %s", potential_facts)
+
+    # Parse each candidate once, deduplicating on the parsed fact so spacing
+    # differences between otherwise identical lines collapse, in first-seen order
+    valid_facts = {}
+    for line in potential_facts:
+        fact = _parse_fact_line(line)
+        if fact is not None:
+            valid_facts[fact] = None
+
+    # Logging for transparency
+    logging.info(f"LLM Output Parsing: {len(potential_facts)} potential facts, {len(valid_facts)} validated")
+
+    # Optional: Print debugging information if not all potential facts were validated
+    if len(valid_facts) < len(potential_facts):
+        logging.warning(f"Parsed only {len(valid_facts)}/{len(potential_facts)} facts due to strict validation")
+
+    return tuple(valid_facts)
+
 
 class AdvancedPrologKnowledgeBaseGenerator:
     def __init__(self,
                  openai_api_key: str = None,
                  prolog_file_path: str = 'ckd_financial_aid.pl',
-                 log_path: str = 'knowledge_base.log'):
+                 log_path: str = 'knowledge_base.log',
+                 llm_cache_path: Optional[str] = None):
         """
         Initialize an advanced Prolog Knowledge Base Generator using LLM-powered knowledge extraction.
 
@@ -37,6 +294,9 @@ class AdvancedPrologKnowledgeBaseGenerator:
             openai_api_key (str, optional): OpenAI API key for LLM processing
             prolog_file_path (str): Path to store the Prolog knowledge base
             log_path (str): Path to store log files
+            llm_cache_path (str, optional): SQLite file that persists LLM responses. Defaults to
+                the LLM_CACHE_PATH environment variable, then '.langchain_cache.db'; an empty
+                string disables the cache. Cached responses contain patient details.
         """
         # Configure comprehensive logging
         logging.basicConfig(
@@ -45,29 +305,45 @@ class AdvancedPrologKnowledgeBaseGenerator:
             format='%(asctime)s - %(levelname)s: %(message)s'
         )
 
+        # Persist LLM responses so repeated prompts are answered from the local cache
+        if llm_cache_path is None:
+            llm_cache_path = os.getenv("LLM_CACHE_PATH", ".langchain_cache.db")
+        if llm_cache_path:
+            set_llm_cache(SQLiteCache(database_path=llm_cache_path))
+
         # Set up OpenAI and LLM Configuration
         self.setup_openai_configuration(openai_api_key)
 
         # Prolog file management
         self.prolog_file_path = prolog_file_path
+        self._kb_file = None  # Append handle, opened on first write
         self._initialize_prolog_file()
 
         # Create advanced prompt templates
         self.extraction_prompt = self._create_knowledge_extraction_prompt()
         self.refinement_prompt = self._create_knowledge_refinement_prompt()
+        self.combined_prompt = self._create_combined_extraction_refinement_prompt()
 
         # Initialize extraction and refinement chains
         self.extraction_chain = (
                 {"user_input": RunnablePassthrough()}
                 | self.extraction_prompt
-                | self.llm
+                | self.extract_llm
                 | StrOutputParser()
         )
 
         self.knowledge_refinement_chain = (
                 {"prolog_facts": RunnablePassthrough()}
                 | self.refinement_prompt
-                | self.llm
+                | self.refine_llm
+                | StrOutputParser()
+        )
+
+        # Single-call chain that extracts already-refined facts
+        self.combined_chain = (
+                {"user_input": RunnablePassthrough()}
+                | self.combined_prompt
+                | self.extract_llm
                 | StrOutputParser()
         )
 
@@ -91,11 +367,37 @@ class AdvancedPrologKnowledgeBaseGenerator:
 
         openai.api_key = openai_api_key
 
-        # Initialize LLM with nuanced settings
-        self.llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0.3,  # Balanced between creativity and precision
-            max_tokens=1024,  # Allow complex output generation
+        # Token bucket shared by both models, since they draw on the same account's
+        # request limit. Batch and async extraction wait here instead of hitting 429s.
+        self.rate_limiter = InMemoryRateLimiter(
+            requests_per_second=10,
+            check_every_n_seconds=0.1,
+            max_bucket_size=20
+        )
+
+        # Extraction is closed-schema slot filling, so it can run on the smallest
+        # model available, including a local OpenAI-compatible server
+        # (e.g. OPENAI_EXTRACTION_BASE_URL=http://localhost:8080/v1)
+        self.extract_llm = ChatOpenAI(
+            model=os.getenv("OPENAI_EXTRACTION_MODEL", "gpt-4o-mini"),
+            base_url=os.getenv("OPENAI_EXTRACTION_BASE_URL"),
+            temperature=0,  # Deterministic output for structured extraction and cache hits
+            max_tokens=384,  # A full fact list is typically ~300 tokens
+            stop=["\n\n\n"],  # Stop decoding once the fact list ends
+            max_retries=3,
+            timeout=30,
+            rate_limiter=self.rate_limiter,
+            api_key=openai_api_key
+        )
+
+        # Refinement reasons over the whole fact list and stays on the hosted model
+        self.refine_llm = ChatOpenAI(
+            model=os.getenv("OPENAI_REFINEMENT_MODEL", "gpt-4o-mini"),
+            temperature=0,
+            max_tokens=1024,
+            max_retries=3,
+            timeout=30,
+            rate_limiter=self.rate_limiter,
             api_key=openai_api_key
         )
 
@@ -103,15 +405,23 @@ class AdvancedPrologKnowledgeBaseGenerator:
         """
         Ensure Prolog knowledge base file exists and is properly initialized.
 
-        Creates the file if it doesn't exist and adds a header comment.
+        Creates the file if it doesn't exist and adds a header comment, then
+        loads the facts already stored so later writes can skip duplicates.
         """
         if not os.path.exists(self.prolog_file_path):
             with open(self.prolog_file_path, 'w') as f:
                 f.write('%% Prolog Knowledge Base\n')
                 f.write('%% Created: {}\n'.format(os.path.basename(self.prolog_file_path)))
-        logging.info(f"Initialized knowledge base at {self.prolog_file_path}")
 
-    def _create_knowledge_extraction_prompt(self) -> PromptTemplate:
+        with open(self.prolog_file_path, 'r') as f:
+            self._known_facts = {
+                line.strip() for line in f
+                if line[:1].islower() and line.rstrip().endswith('.')
+            }
+        logging.info(f"Initialized knowledge base at {self.prolog_file_path} "
+                     f"with {len(self._known_facts)} existing facts")
+
+    def _create_knowledge_extraction_prompt(self) -> ChatPromptTemplate:
         """
         Create a sophisticated prompt for comprehensive knowledge extraction.
 
@@ -120,63 +430,12 @@ class AdvancedPrologKnowledgeBaseGenerator:
         - Handle complex linguistic structures
         - Ensure consistent output format
         """
-        return PromptTemplate(
-            input_variables=['user_input'],
-            template="""
-        Prolog Knowledge Extraction with Controlled Vocabulary:
-
-        Objective: Analyze the input text and generate Prolog facts using the controlled vocabulary defined below. Ensure that all facts are precisely structured to avoid inconsistency and follow the correct formats. Each fact must strictly adhere to the predefined predicates and their allowed values. If it's in a another language, translate it into english before using.
-
-        Controlled Vocabulary:
-        1. **Person**:
-           - person(Name): Defines a person by their name.
-           - age(Person, Age): Age of the person (integer, in years).
-           - gender(Person, Gender): Gender of the person (e.g., 'male', 'female', 'other').
-           - profession(Person, Job): Job or occupation of the person (e.g., 'teacher', 'engineer').
-           - marital_status(Person, Status): Marital status (e.g., 'single', 'married', 'divorced').
-           - education(Person, Level): Educational qualification (e.g., 'high school', 'bachelor's', 'PhD').
-
-        2. **Health**:
-           - health_condition(Person, Condition): Specific health conditions (e.g., 'stage_4_ckd', 'hypertension').
-           - chronic_condition(Person, YesNo): If the person has a chronic condition ('yes' or 'no').
-           - disability(Person, YesNo): Whether the person has a disability ('yes' or 'no').
-
-        3. **Location**:
-           - resides_in(Person, Area): Area of residence (e.g., 'urban', 'rural').
-           - location(Person, Province): Geographical location (e.g., 'Colombo', 'Kandy').
-           - commute_time(Person, Time): Commute time to work (in minutes).
-
-        4. **Family**:
-           - children(Person, Count): Number of children (integer).
-           - dependent_children(Person, Count): Number of children under 18 (integer).
-           - elderly_dependents(Person, Count): Number of elderly dependents (integer).
-           - family_structure(Person, Structure): Describes the family structure (e.g., 'nuclear', 'extended').
-
-        5. **Economic**:
-           - monthly_income(Person, Amount): Monthly income (in local currency).
-           - income_level(Person, Level): Income level classification ('low', 'middle', 'high').
-           - fixed_income(Person, YesNo): Whether the person has a fixed income ('yes' or 'no').
-           - debt_status(Person, YesNo): Whether the person has any debt ('yes' or 'no').
-
-        6. **Additional Attributes**:
-           - communication_preference(Person, Medium): Preferred communication medium (e.g., 'phone', 'email').
-           - access_to_healthcare(Person, YesNo): Whether the person has access to healthcare services ('yes' or 'no').
-           - language_spoken(Person, Language): Primary language spoken by the person (e.g., 'Sinhala', 'Tamil', 'English').
-
-        Instructions:
-        1. Each Prolog fact must be formatted as: `predicate(argument1, argument2, ...)`.
-        2. Ensure that each fact follows the standardized vocabulary above. Do not deviate from the defined predicates or use synonyms.
-        3. Always check that values are within allowed categories (e.g., use 'male' or 'female' for gender, not any other variations).
-        4. If the input includes multiple facts about a person, generate a separate Prolog fact for each piece of information.
-
-        Example Input:
-        {user_input}
-
-        Example Output:
-        """
-        )
+        return ChatPromptTemplate.from_messages([
+            ("system", _EXTRACTION_SYSTEM_PROMPT),
+            ("user", "{user_input}")
+        ])
 
-    def _create_knowledge_refinement_prompt(self) -> PromptTemplate:
+    def _create_knowledge_refinement_prompt(self) -> ChatPromptTemplate:
         """
         Create a sophisticated knowledge refinement prompt template.
 
@@ -186,31 +445,89 @@ class AdvancedPrologKnowledgeBaseGenerator:
         - Ensure logical consistency
         - Standardize representation
         """
-        return PromptTemplate(
-            input_variables=['prolog_facts'],
-            template="""Knowledge Refinement Process:
+        return ChatPromptTemplate.from_messages([
+            ("system", _REFINEMENT_SYSTEM_PROMPT),
+            ("user", "{prolog_facts}")
+        ])
+
+    def _create_combined_extraction_refinement_prompt(self) -> ChatPromptTemplate:
+        """
+        Create a prompt that performs extraction and refinement in one LLM call.
 
-        Refine the following Prolog facts with these objectives:
-        1. Eliminate redundant or semantically equivalent facts
-        2. Infer potential missing relationships
-        3. Ensure logical consistency and secure integrity 
-        4. Standardize predicate naming and formatting
+        Merges the extraction and refinement instructions so the model emits
+        refined facts directly, avoiding a second round trip.
+        """
+        return ChatPromptTemplate.from_messages([
+            ("system", _COMBINED_SYSTEM_PROMPT),
+            ("user", "{user_input}")
+        ])
 
-        Constraints:
-        - Maintain original semantic meaning
-        - Prefer more specific predicates
-        - Remove overly generic facts
-        - Add contextual relationships if possible
+    def _try_rule_based_extract(self, text: str) -> Optional[List[Fact]]:
+        """
+        Extract facts from structured input without calling the LLM.
 
-        Input Prolog Facts:
-        {prolog_facts}
+        Recognizes "attribute: value" pairs and a few key phrases ("aged 45",
+        "lives in Colombo"). Returns None when the input has no name or too
+        few recognized attributes, so the caller falls back to the LLM.
 
-        Refined Knowledge Base:"""
-        )
+        Args:
+            text (str): Input natural language text
+
+        Returns:
+            Optional[List[Fact]]: Prolog facts, or None if the input is not structured enough
+        """
+        values = {}
+        for label, value in _RULE_FIELD_RE.findall(text):
+            # The label may be preceded by unrelated words, so try its trailing words too
+            words = label.lower().split()
+            for start in range(len(words)):
+                predicate = _RULE_FIELD_PREDICATES.get('_'.join(words[start:]))
+                if predicate:
+                    values.setdefault(predicate, value.strip())
+                    break
+        for pattern, predicate in _RULE_PHRASE_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                values.setdefault(predicate, match.group(1).strip())
+
+        name = values.pop('person', None)
+        if not name or len(values) < _RULE_MIN_MATCHES:
+            return None
+
+        person = self._to_prolog_atom(name)
+        facts = [Fact('person', (person,))]
+        for predicate, value in values.items():
+            if predicate in _RULE_NUMERIC_PREDICATES:
+                # Anything but a whole number is ambiguous; leave it to the LLM
+                number = _RULE_NUMBER_RE.fullmatch(value)
+                if not number:
+                    return None
+                term = str(int(number.group(1).replace(',', '')))
+            elif predicate == 'health_condition' and value.isdigit():
+                term = f"stage_{value}_ckd"
+            else:
+                term = self._to_prolog_atom(value)
+            facts.append(Fact(predicate, (person, term)))
+
+        # Atoms normalized down to nothing cannot be written as facts
+        facts = [fact for fact in facts if all(fact.args)]
+        if len(facts) - 1 < _RULE_MIN_MATCHES:
+            return None
+
+        logging.info(f"Rule-based extraction produced {len(facts)} facts without an LLM call")
+        return facts
+
+    @staticmethod
+    def _to_prolog_atom(value: str) -> str:
+        """Normalize free text to a lowercase, underscore-separated Prolog atom."""
+        return re.sub(r'[^a-z0-9_]', '', value.strip().lower().replace(' ', '_'))
 
     def extract_advanced_knowledge(self, text: str) -> List[str]:
         """
-        Advanced knowledge extraction using LLM with multi-stage processing.
+        Advanced knowledge extraction using a single combined extraction and refinement LLM call.
+
+        Long descriptions are split into sentence-aligned chunks that are
+        extracted concurrently and merged.
 
         Args:
             text (str): Input natural language text
@@ -218,26 +535,167 @@ class AdvancedPrologKnowledgeBaseGenerator:
         Returns:
             List[str]: Structured Prolog facts
         """
+        # Structured inputs are handled locally without an LLM round trip
+        rule_facts = self._try_rule_based_extract(text)
+        if rule_facts is not None:
+            return [fact.to_prolog() for fact in rule_facts]
+
+        chunks = _chunk_text(text)
+
         try:
-            # Use LLM for comprehensive knowledge extraction
-            llm_extraction = self.extraction_chain.invoke(text)
-            print("llm_extraction", llm_extraction)
+            if len(chunks) == 1:
+                # Extract and refine knowledge in a single LLM call
+                llm_extractions = [_invoke_with_retry(self.combined_chain, text)]
+            else:
+                # Later chunks may not mention the patient, so each one leads with
+                # the opening sentence, which normally names them
+                lead = _SENTENCE_SPLIT_RE.split(text.strip(), maxsplit=1)[0]
+                chunks[1:] = [f"{lead} {chunk}" for chunk in chunks[1:]]
+                with ThreadPoolExecutor(max_workers=min(len(chunks), 5)) as executor:
+                    llm_extractions = list(executor.map(
+                        partial(_invoke_with_retry, self.combined_chain), chunks
+                    ))
+                logging.info(f"Extracted {len(chunks)} chunks concurrently")
+            logging.debug("llm_extraction: %s", llm_extractions)
+
+            # Parse and clean extracted facts, merging chunks in order without duplicates
+            merged_facts = dict.fromkeys(
+                fact for llm_extraction in llm_extractions
+                for fact in self._parse_llm_output(llm_extraction)
+            )
+            refined_facts = [fact.to_prolog() for fact in merged_facts]
+            logging.debug("refined_facts: %s", refined_facts)
+
+            logging.info(f"Successfully extracted {len(refined_facts)} structured facts")
+            return refined_facts
 
-            # Parse and clean extracted facts
-            prolog_facts = self._parse_llm_output(llm_extraction)
-            # print("prolog_facts", prolog_facts)
+        except openai.OpenAIError as e:
+            # Retries are exhausted or the error is not transient
+            logging.error(f"Knowledge extraction failed: {e}")
+            return []
 
-            # Refine extracted knowledge
-            refined_facts = self.refine_knowledge(prolog_facts)
-            print("refined_facts", refined_facts)
+    def extract_advanced_knowledge_batch(self, texts: List[str], max_concurrency: int = 10) -> List[List[str]]:
+        """
+        Extract knowledge from several inputs with concurrent LLM calls.
+
+        Args:
+            texts (List[str]): Input natural language texts
+            max_concurrency (int): Maximum number of LLM calls in flight at once
+
+        Returns:
+            List[List[str]]: Structured Prolog facts for each input, in input order
+        """
+        # Only inputs the rule-based extractor cannot handle go to the LLM
+        results = [self._try_rule_based_extract(text) for text in texts]
+        pending = [index for index, facts in enumerate(results) if facts is None]
+        results = [
+            facts if facts is None else [fact.to_prolog() for fact in facts]
+            for facts in results
+        ]
+
+        def extract(text):
+            # Each call gets the same backoff as the single-input path; a failed
+            # input is returned as its error so the others still complete
+            try:
+                return _invoke_with_retry(self.combined_chain, text)
+            except openai.OpenAIError as e:
+                return e
+
+        llm_extractions = []
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(len(pending), max_concurrency)) as executor:
+                llm_extractions = list(executor.map(extract, [texts[index] for index in pending]))
+
+        for index, llm_extraction in zip(pending, llm_extractions):
+            if isinstance(llm_extraction, openai.OpenAIError):
+                logging.error(f"Knowledge extraction failed: {llm_extraction}")
+                results[index] = []
+            else:
+                results[index] = [fact.to_prolog() for fact in self._parse_llm_output(llm_extraction)]
+
+        logging.info(f"Batch extraction processed {len(texts)} inputs")
+        return results
+
+    async def aextract_advanced_knowledge(self, text: str) -> List[str]:
+        """
+        Asynchronous variant of extract_advanced_knowledge.
+
+        Args:
+            text (str): Input natural language text
+
+        Returns:
+            List[str]: Structured Prolog facts
+        """
+        rule_facts = self._try_rule_based_extract(text)
+        if rule_facts is not None:
+            return [fact.to_prolog() for fact in rule_facts]
+
+        try:
+            llm_extraction = await _ainvoke_with_retry(self.combined_chain, text)
+
+            refined_facts = [fact.to_prolog() for fact in self._parse_llm_output(llm_extraction)]
 
             logging.info(f"Successfully extracted {len(refined_facts)} structured facts")
-            return list(set(refined_facts))  # Remove duplicates
+            return refined_facts
 
-        except Exception as e:
+        except openai.OpenAIError as e:
+            # Retries are exhausted or the error is not transient
             logging.error(f"Knowledge extraction failed: {e}")
             return []
 
+    async def aextract_many(self, texts: List[str], max_concurrent: int = 5) -> List[List[str]]:
+        """
+        Extract knowledge from several inputs concurrently.
+
+        Args:
+            texts (List[str]): Input natural language texts
+            max_concurrent (int): Maximum number of LLM calls in flight, to respect provider rate limits
+
+        Returns:
+            List[List[str]]: Structured Prolog facts for each input, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def extract(text):
+            async with semaphore:
+                return await self.aextract_advanced_knowledge(text)
+
+        return await asyncio.gather(*[extract(text) for text in texts])
+
+    def stream_advanced_knowledge(self, text: str) -> Iterator[str]:
+        """
+        Stream structured Prolog facts as the LLM generates them.
+
+        Each complete output line is validated as soon as it arrives, so
+        callers can display facts before the full response has finished.
+
+        Args:
+            text (str): Input natural language text
+
+        Yields:
+            str: Validated Prolog facts, without duplicates
+        """
+        seen = set()
+        buffer = ''
+
+        def valid_new_facts(lines):
+            for line in lines:
+                fact = _parse_fact_line(line.strip())
+                if fact is not None and fact not in seen:
+                    seen.add(fact)
+                    yield fact.to_prolog()
+
+        for chunk in self.combined_chain.stream(text):
+            buffer += chunk
+            if '\n' in buffer:
+                *complete_lines, buffer = buffer.split('\n')
+                yield from valid_new_facts(complete_lines)
+
+        # The last line may not be newline-terminated
+        yield from valid_new_facts([buffer])
+
+        logging.info(f"Streamed {len(seen)} structured facts")
+
     def refine_knowledge(self, prolog_facts: List[str]) -> List[str]:
         """
         Refine extracted knowledge using an advanced LLM-powered refinement process.
@@ -253,20 +711,20 @@ class AdvancedPrologKnowledgeBaseGenerator:
 
         try:
             # Invoke the refinement chain
-            refined_facts_str = self.knowledge_refinement_chain.invoke(facts_string)
+            refined_facts_str = _invoke_with_retry(self.knowledge_refinement_chain, facts_string)
 
             # Parse the refined facts
-            refined_facts = self._parse_llm_output(refined_facts_str)
+            refined_facts = [fact.to_prolog() for fact in self._parse_llm_output(refined_facts_str)]
 
             logging.info(f"Knowledge refinement successful. Refined {len(prolog_facts)} to {len(refined_facts)} facts.")
 
             return refined_facts
 
-        except Exception as e:
+        except openai.OpenAIError as e:
             logging.error(f"Knowledge refinement failed: {e}")
             return prolog_facts  # Fallback to original facts if refinement fails
 
-    def _parse_llm_output(self, llm_extraction: str) -> List[str]:
+    def _parse_llm_output(self, llm_extraction: str) -> List[Fact]:
         """
         Parse and clean LLM-generated Prolog facts with enhanced extraction.
 
@@ -280,53 +738,9 @@ class AdvancedPrologKnowledgeBaseGenerator:
             llm_extraction (str): Raw LLM-generated text.
 
         Returns:
-            List[str]: Cleaned and validated Prolog facts.
-        """
-        # Enhanced fact extraction pattern
-        # Changes:
-        # - Allow for single quotes around strings (e.g., 'Nimal Perera', 'hypertension')
-        # - Supports multi-word arguments with underscores (e.g., stage_4_ckd, colombo)
-        # - Ensures lowercase start for predicates and arguments
-        # - Requires period at the end of each fact
-        fact_pattern = re.compile(
-            r'^[a-z][a-z0-9_]*\((?:[a-z0-9_]+(?:_[a-z0-9_]+)*|\'[^\']+\')(?:,\s*(?:[a-z0-9_]+(?:_[a-z0-9_]+)*|\'[^\']+\'))*\)\.$',
-            re.MULTILINE
-        )
-
-        print("inside_parse", llm_extraction)
-
-        # Extract potential facts based on the enhanced pattern
-        potential_facts = fact_pattern.findall(llm_extraction)
-        print("potential_facts:", potential_facts)
-
-        # Additional cleaning and validation based on the expanded controlled vocabulary
-        valid_facts = []
-        for fact in potential_facts:
-            # Ensure each fact strictly adheres to the Prolog fact format
-            if re.match(
-                    r'^[a-z][a-z0-9_]*\((?:[a-z0-9_]+(?:_[a-z0-9_]+)*|\'[^\']+\')(?:,\s*(?:[a-z0-9_]+(?:_[a-z0-9_]+)*|\'[^\']+\'))*\)\.$',
-                    fact):
-                # Check if the predicate matches the allowed controlled vocabulary
-                predicate = fact.split('(')[0]
-                valid_predicates = [
-                    'person', 'age', 'gender', 'profession', 'marital_status', 'education',
-                    'health_condition', 'chronic_condition', 'disability', 'resides_in',
-                    'location', 'children', 'monthly_income', 'income_level', 'fixed_income',
-                    'debt_status', 'communication_preference', 'access_to_healthcare', 'language_spoken',
-                    'family_structure', 'dependent_children', 'elderly_dependents', 'commute_time'
-                ]
-
-                if predicate in valid_predicates:
-                    valid_facts.append(fact.strip())
-
-        # Logging for transparency
-        logging.info(f"LLM Output Parsing: {len(potential_facts)} potential facts, {len(valid_facts)} validated")
-
-        # Optional: Print debugging information if not all potential facts were validated
-        if len(valid_facts) < len(potential_facts):
-            logging.warning(f"Parsed only {len(valid_facts)}/{len(potential_facts)} facts due to strict validation")
-
-        return valid_facts
+            List[Fact]: Cleaned and validated Prolog facts, deduplicated in output order.
+        """
+        return list(_parse_prolog_facts(llm_extraction))
 
     def convert_to_prolog(self, user_input: str) -> str:
         """
@@ -346,16 +760,17 @@ class AdvancedPrologKnowledgeBaseGenerator:
             logging.error(f"Conversion error: {e}")
             raise
 
-    def add_to_knowledge_base(self, prolog_facts: List[str]):
+    def add_to_knowledge_base(self, prolog_facts: Iterable[Union[Fact, str]]):
         """
         Add multiple Prolog facts to the knowledge base file.
 
         Args:
-            prolog_facts (List[str]): Facts to add to the knowledge base
+            prolog_facts (Iterable[Union[Fact, str]]): Parsed facts or Prolog fact strings to add
         """
-        # Clean and validate facts
+        # Clean and validate facts, serializing parsed facts once for the write
         valid_facts = [
-            fact for fact in prolog_facts
+            fact.to_prolog() if isinstance(fact, Fact) else fact
+            for fact in prolog_facts
             if self.validate_prolog_syntax(fact)
         ]
 
@@ -363,14 +778,37 @@ class AdvancedPrologKnowledgeBaseGenerator:
             logging.warning("No valid facts to add to knowledge base")
             return
 
-        with open(self.prolog_file_path, 'a') as f:
-            f.write('\n% New Knowledge Block\n')
-            for fact in valid_facts:
-                f.write(f"{fact}\n")
+        # Skip facts already in the file (or repeated within this block)
+        new_facts = [
+            fact for fact in dict.fromkeys(valid_facts)
+            if fact not in self._known_facts
+        ]
+
+        if not new_facts:
+            logging.info("All facts already present in knowledge base; nothing written")
+            return
+
+        # Write the whole block at once through a handle kept open across calls.
+        # Flush so the Prolog engine and UI see the new facts immediately.
+        kb_file = self._get_knowledge_base_file()
+        kb_file.write('\n% New Knowledge Block\n' + '\n'.join(new_facts) + '\n')
+        kb_file.flush()
+        self._known_facts.update(new_facts)
 
-        logging.info(f"Added {len(valid_facts)} facts to knowledge base")
+        logging.info(f"Added {len(new_facts)} facts to knowledge base")
 
-    def validate_prolog_syntax(self, prolog_fact: str) -> bool:
+    def _get_knowledge_base_file(self):
+        """
+        Return the append handle for the knowledge base file, opening it on first use.
+
+        The handle is closed automatically at interpreter exit.
+        """
+        if self._kb_file is None or self._kb_file.closed:
+            self._kb_file = open(self.prolog_file_path, 'a')
+            atexit.register(self._kb_file.close)
+        return self._kb_file
+
+    def validate_prolog_syntax(self, prolog_fact: Union[Fact, str]) -> bool:
         """
         Validate individual Prolog fact syntax with enhanced flexibility.
 
@@ -380,19 +818,17 @@ class AdvancedPrologKnowledgeBaseGenerator:
         - Maintain strict Prolog predicate naming rules
 
         Args:
-            prolog_fact (str): Prolog fact to validate
+            prolog_fact (Union[Fact, str]): Parsed fact or Prolog fact string to validate
 
         Returns:
             bool: Whether the fact has valid Prolog syntax
         """
-        # Enhanced regex pattern with more flexible validation
-        fact_pattern = re.compile(
-            r'^[a-z][a-z0-9_]*\([a-z0-9_]+(?:_[a-z0-9_]+)*(?:,\s*[a-z0-9_]+(?:_[a-z0-9_]+)*)*\)\.$',
-            re.MULTILINE
-        )
-
-        # Validate the fact
-        is_valid = bool(fact_pattern.match(prolog_fact))
+        # Parsed facts already passed the syntax check; only quoted arguments are excluded
+        if isinstance(prolog_fact, Fact):
+            is_valid = (prolog_fact.predicate in _VALID_PREDICATES
+                        and not any(arg.startswith("'") for arg in prolog_fact.args))
+        else:
+            is_valid = bool(_VALIDATE_RE.match(prolog_fact))
 
         # Optional: Add logging for validation process
         if not is_valid:
@@ -416,13 +852,12 @@ class AdvancedPrologKnowledgeBaseGenerator:
                 break
 
             try:
-                # Extract advanced knowledge with refinement
-                prolog_facts = self.extract_advanced_knowledge(user_input)
-
-                # Display extracted and refined facts
+                # Extract advanced knowledge with refinement, displaying facts as they stream in
                 print("\n🔍 Extracted & Refined Knowledge:")
-                for fact in prolog_facts:
+                prolog_facts = []
+                for fact in self.stream_advanced_knowledge(user_input):
                     print(fact)
+                    prolog_facts.append(fact)
 
                 # Confirm adding to knowledge base
                 add_confirm = input("\nAdd these facts to knowledge base? (y/n): ")
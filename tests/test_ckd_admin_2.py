@@ -0,0 +1,34 @@
+import pytest
+
+from ckd_admin_2 import AdvancedCKDKnowledgeBaseGenerator
+
+
+@pytest.fixture
+def generator(tmp_path):
+    return AdvancedCKDKnowledgeBaseGenerator(log_path=str(tmp_path / 'kb.log'))
+
+
+def test_normalize_input_extracts_every_field(generator):
+    data = generator.normalize_input(
+        "Nimal is a 45 years old male. His monthly income is 20000 and he has stage 3 CKD. He lives in Colombo"
+    )
+    assert data == {
+        'full_name': 'Nimal', 'age': '45', 'gender': 'male',
+        'monthly_income': '20000', 'ckd_stage': '3', 'residence_type': 'Colombo'
+    }
+
+
+def test_normalize_input_keeps_overlapping_fields(generator):
+    # The age phrase's trailing word overlaps "lives in"; both must still match
+    data = generator.normalize_input("Nimal is a 45 years old lives in Kandy")
+    assert data['age'] == '45'
+    assert data['residence_type'] == 'Kandy'
+
+
+def test_normalize_input_without_trigger_words(generator):
+    assert generator.normalize_input("No structured details here") == {}
+
+
+def test_residence_is_kept_without_income(generator):
+    facts = generator.process_patient_description("Nimal is a 45 years old male. He lives in Kandy")
+    assert 'socio_economic_profile(nimal, unknown, unknown, Kandy, 0, unknown).' in facts
@@ -0,0 +1,33 @@
+import pytest
+
+from pl_converter_3 import AdvancedPrologKnowledgeBaseGenerator
+
+
+@pytest.fixture
+def generator(tmp_path):
+    return AdvancedPrologKnowledgeBaseGenerator(
+        openai_api_key='test-key',
+        prolog_file_path=str(tmp_path / 'kb.pl'),
+        log_path=str(tmp_path / 'kb.log'),
+        llm_cache_path=''
+    )
+
+
+def _rule_facts(generator, text):
+    facts = generator._try_rule_based_extract(text)
+    return None if facts is None else [fact.to_prolog() for fact in facts]
+
+
+@pytest.mark.parametrize('income', ['LKR 25,000', 'Rs. 25,000', '25,000', '25000', '25,000 rupees'])
+def test_rule_based_income_amounts(generator, income):
+    facts = _rule_facts(generator, f"Name: Nimal Perera. Age: 45. Gender: male. Monthly income: {income}.")
+    assert 'monthly_income(nimal_perera, 25000).' in facts
+
+
+def test_rule_based_grouped_millions(generator):
+    facts = _rule_facts(generator, "Name: Nimal Perera. Age: 45. Gender: male. Monthly income: LKR 1,250,000.")
+    assert 'monthly_income(nimal_perera, 1250000).' in facts
+
+
+def test_rule_based_ambiguous_amount_falls_back_to_llm(generator):
+    assert _rule_facts(generator, "Name: Nimal Perera. Age: 45. Gender: male. Monthly income: about 25k.") is None
@@ -1,11 +1,15 @@
 % Program eligibility rules
 
+% CKD stages treated as severe, indexed on the stage
+severe_ckd(stage_4_ckd).
+severe_ckd(stage_5_ckd).
+
 % Rule for "Suwa" CKD Aid Program
 eligible_for_suwa_ckd_aid(Person) :-
     person(Person),
     age(Person, Age), Age > 40,
     health_condition(Person, HealthCondition),
-    (HealthCondition = stage_4_ckd ; HealthCondition = stage_5_ckd),
+    severe_ckd(HealthCondition),
     monthly_income(Person, Income), Income < 25000.
 
 % Rule for "Diriya" Single Parent Support Program
@@ -87,6 +91,143 @@ eligible_for_program(Person, govi_jana_support) :-
 eligible_for_program(Person, arogya_elderly_care) :-
     eligible_for_arogya_elderly_care(Person).
 
+% Programs in the order they are reported
+program(suwa_ckd_aid).
+program(diriya_support).
+program(thurunu_piyasa).
+program(sahana_healthcare).
+program(divisaviya_income_support).
+program(nirmala_empowerment).
+program(daruwan_suraksha).
+program(govi_jana_support).
+program(arogya_elderly_care).
+
+% Eligible programs plus, for every other program, the reasons the person
+% does not qualify, in a single query. Diagnostics is a list of
+% [Program, Reasons] pairs.
+eligibility_report(Person, Programs, Diagnostics) :-
+    once(person(Person)),
+    eligible_programs(Person, Programs),
+    findall([Program, Reasons],
+            ( program(Program),
+              \+ memberchk(Program, Programs),
+              program_diagnostics(Person, Program, Reasons) ),
+            Diagnostics).
+
+% Eligible programs for many people in one query, as [Person, Programs]
+% pairs. People without a person/1 fact are left out.
+bulk_eligibility(People, Rows) :-
+    findall([Person, Programs],
+            ( member(Person, People),
+              once(person(Person)),
+              eligible_programs(Person, Programs) ),
+            Rows).
+
+% Memoized eligibility_report/3. The first report for a person is asserted
+% and later calls reuse it. This is the only cache of reports below the UI:
+% it can be filled ahead of time for everyone on record, which a cache keyed
+% on the first request cannot. After consulting new facts, call
+% clear_cached_report/1 for the people they describe, or clear_cached_reports/0.
+:- dynamic cached_report/3.
+
+cached_eligibility_report(Person, Programs, Diagnostics) :-
+    cached_report(Person, Programs, Diagnostics), !.
+cached_eligibility_report(Person, Programs, Diagnostics) :-
+    eligibility_report(Person, Programs, Diagnostics),
+    assertz(cached_report(Person, Programs, Diagnostics)).
+
+clear_cached_reports :-
+    retractall(cached_report(_, _, _)).
+
+% Compute and memoize a person's report, succeeding with a message only when
+% that fails. Errors are caught per person, so a malformed fact such as
+% monthly_income(x, low) cannot stop the reports of everyone else.
+report_failure(Person, Message) :-
+    catch(( once(cached_eligibility_report(Person, _, _)) -> fail ; Message = no_report ),
+          Error,
+          term_to_atom(Error, Message)).
+
+% [Person, Message] pairs for everyone on record whose report failed.
+precompute_reports(Failures) :-
+    findall([Person, Message], (person(Person), report_failure(Person, Message)), Failures).
+
+% Drop one person's report, keeping everyone else's after their facts change.
+clear_cached_report(Person) :-
+    retractall(cached_report(Person, _, _)).
+
+% Reason atoms for the program criteria a person fails. A criterion is only
+% reported when the facts it tests are on record.
+program_diagnostics(Person, Program, Reasons) :-
+    findall(Reason, failed_criterion(Person, Program, Reason), Reasons).
+
+failed_criterion(Person, suwa_ckd_aid, age_40_or_below) :-
+    once((age(Person, Age), Age =< 40)).
+failed_criterion(Person, suwa_ckd_aid, ckd_stage_not_met) :-
+    once((health_condition(Person, Condition), \+ severe_ckd(Condition))).
+failed_criterion(Person, suwa_ckd_aid, income_over_25000) :-
+    once((monthly_income(Person, Income), Income >= 25000)).
+
+failed_criterion(Person, diriya_support, not_single_parent) :-
+    once((marital_status(Person, Status), Status \= single)).
+failed_criterion(Person, diriya_support, no_dependent_children) :-
+    once((dependent_children(Person, Children), Children =:= 0)).
+failed_criterion(Person, diriya_support, income_over_20000) :-
+    once((monthly_income(Person, Income), Income >= 20000)).
+
+failed_criterion(Person, thurunu_piyasa, not_rural) :-
+    once((location(Person, Location), \+ rural_area(Location))).
+failed_criterion(Person, thurunu_piyasa, education_not_met) :-
+    once((education(Person, Level), Level \= primary)).
+failed_criterion(Person, thurunu_piyasa, income_over_15000) :-
+    once((monthly_income(Person, Income), Income >= 15000)).
+
+failed_criterion(Person, sahana_healthcare, no_chronic_condition) :-
+    once((chronic_condition(Person, Condition), Condition \= yes)).
+failed_criterion(Person, sahana_healthcare, has_healthcare_access) :-
+    once(access_to_healthcare(Person, yes)).
+failed_criterion(Person, sahana_healthcare, income_over_20000) :-
+    once((monthly_income(Person, Income), Income >= 20000)).
+
+failed_criterion(Person, divisaviya_income_support, income_over_15000) :-
+    once((monthly_income(Person, Income), Income >= 15000)).
+failed_criterion(Person, divisaviya_income_support, family_structure_not_met) :-
+    once((family_structure(Person, Structure), Structure \= nuclear)).
+
+failed_criterion(Person, nirmala_empowerment, not_female) :-
+    once((gender(Person, Gender), Gender \= female)).
+failed_criterion(Person, nirmala_empowerment, not_single) :-
+    once((marital_status(Person, Status), Status \= single)).
+failed_criterion(Person, nirmala_empowerment, income_over_18000) :-
+    once((monthly_income(Person, Income), Income >= 18000)).
+
+failed_criterion(Person, daruwan_suraksha, no_children) :-
+    once((children(Person, Children), Children =:= 0)).
+failed_criterion(Person, daruwan_suraksha, no_dependent_children) :-
+    once((dependent_children(Person, Children), Children =:= 0)).
+failed_criterion(Person, daruwan_suraksha, income_over_20000) :-
+    once((monthly_income(Person, Income), Income >= 20000)).
+
+failed_criterion(Person, govi_jana_support, not_tea_plucker) :-
+    once((profession(Person, Profession), Profession \= part_time_tea_plucker)).
+failed_criterion(Person, govi_jana_support, not_rural) :-
+    once((location(Person, Location), \+ rural_area(Location))).
+failed_criterion(Person, govi_jana_support, income_over_18000) :-
+    once((monthly_income(Person, Income), Income >= 18000)).
+
+failed_criterion(Person, arogya_elderly_care, age_60_or_below) :-
+    once((age(Person, Age), Age =< 60)).
+failed_criterion(Person, arogya_elderly_care, income_over_20000) :-
+    once((monthly_income(Person, Income), Income >= 20000)).
+
+% Everything test_person reports, in one query. `none` marks values that do not apply.
+person_summary(Person, Eligible, DialysisCost, TransportationCost, CaregivingCost, TotalAid, Priority) :-
+    (eligible_for_aid(Person) -> Eligible = yes ; Eligible = no),
+    (dialysis_cost(Person, DialysisCost) -> true ; DialysisCost = none),
+    (indirect_cost(Person, TransportationCost, CaregivingCost) -> true
+    ; TransportationCost = none, CaregivingCost = none),
+    (recommended_aid(Person, TotalAid) -> true ; TotalAid = none),
+    (priority_score(Person, Priority) -> true ; Priority = none).
+
 
 %output Programs = [suwa_ckd_aid, diriya_support].
 
@@ -1,32 +1,132 @@
+import os
+import sys
 import streamlit as st
-from formtter import CKDFinancialAidKnowledgeManager
-from pl_intergration_2 import ApplicationDenialExplainer, ApplicationGenerator
+from formtter import extract_person_name, get_manager
+from pl_intergration_2 import ApplicationDenialExplainer, ExplanationUnavailable, format_reason, program_title
 
-def local_css(file_name):
+# Session state that tracks the patient workflow; cleared on reset
+_SESSION_KEYS = ('patient_name', 'patient_facts', 'application_status', 'eligibility_result')
+
+# Keyed on mtime, so only the current version of the file is worth keeping
+@st.cache_data(show_spinner=False, max_entries=1)
+def _load_css(file_name, mtime):
     with open(file_name) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+        return f'<style>{f.read()}</style>'
+
+def local_css(file_name):
+    # Streamlit drops elements that are not re-emitted on a rerun, so the style
+    # tag is written every run; only the file read is cached
+    st.markdown(_load_css(file_name, os.path.getmtime(file_name)), unsafe_allow_html=True)
 
 # Create a custom.css file with your styling
 local_css("custom.css")
 
+@st.cache_resource
+def _get_components():
+    """
+    Build the knowledge manager and denial explainer once per server process
+    and share them across reruns and sessions.
+    """
+    denial_explainer = ApplicationDenialExplainer()
+
+    # Evaluate everyone already on record now, once per process, instead of
+    # on each patient's first eligibility check. People with malformed facts are
+    # logged and skipped, so they cannot stop the app from starting.
+    denial_explainer.precompute_eligibility()
+
+    return get_manager('ckd_financial_aid.pl'), denial_explainer
+
+
+@st.cache_resource
+def _get_app_generator():
+    """
+    Build the application generator on first use, once per server process.
+
+    Page loads that never reach a patient submission skip building its LLM client.
+    """
+    from pl_intergration_2 import ApplicationGenerator
+    return ApplicationGenerator()
+
+# Eligibility and applications are deterministic in the patient's facts, so
+# results are cached per patient and keyed on those facts as well. The facts
+# are kept in session state as a tuple, so they serve as the key directly.
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60)
+def _cached_eligibility(patient_name, facts_key):
+    # Strict, so a failed LLM explanation raises and is not cached
+    return _get_components()[1].analyze_eligibility(patient_name, strict=True)
+
+
+def _eligibility(patient_name, facts_key):
+    """Return the cached eligibility result, or an uncached one with the fallback explanation."""
+    try:
+        return _cached_eligibility(patient_name, facts_key)
+    except ExplanationUnavailable as e:
+        return e.result
+
+
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60)
+def _cached_application(patient_name, facts_key):
+    return _get_app_generator().generate_application(patient_name)
+
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def _read_kb(path, mtime):
+    """Read the knowledge base file; mtime is part of the key so appended facts are picked up."""
+    with open(path, 'r') as f:
+        return f.read()
+
+
+@st.fragment
+def _render_eligibility(eligibility_result):
+    """
+    Display an eligibility result.
+    """
+    # Display overall eligibility status
+    if eligibility_result.is_eligible:
+        st.success("Patient is ELIGIBLE for financial aid.")
+    else:
+        st.error("Patient is NOT fully eligible for financial aid.")
+
+    # Eligible Programs Section
+    st.subheader("Eligible Programs")
+    if eligibility_result.eligible_programs:
+        st.markdown("\n\n".join(
+            f"✅ {program_title(program)}" for program in eligibility_result.eligible_programs
+        ))
+    else:
+        st.markdown("*No programs currently eligible*")
+
+    # Non-Eligible Programs Section
+    st.subheader("Non-Eligible Programs")
+    if eligibility_result.non_eligible_programs:
+        st.markdown("\n\n".join(
+            f"❌ {program_title(program)}" for program in eligibility_result.non_eligible_programs
+        ))
+    else:
+        st.markdown("*All programs are eligible*")
+
+    # Detailed Explanation Section
+    st.subheader("Detailed Eligibility Explanation")
+    st.info(eligibility_result.explanation)
+
+    # Optional: Denial Reasons
+    if eligibility_result.denial_reasons:
+        st.subheader("Specific Denial Reasons")
+        st.markdown("\n\n".join(
+            f"🚫 {format_reason(reason)}" for reason in eligibility_result.denial_reasons
+        ))
+
+
 class CKDFinancialAidExpertSystem:
     def __init__(self):
         """
         Initialize the Expert System with key components
         """
-        self.knowledge_manager = CKDFinancialAidKnowledgeManager()
-        self.denial_explainer = ApplicationDenialExplainer()
-        self.application_generator = ApplicationGenerator()
+        self.knowledge_manager, self.denial_explainer = _get_components()
 
         # Initialize session state for tracking patient workflow
-        if 'patient_name' not in st.session_state:
-            st.session_state.patient_name = None
-        if 'patient_facts' not in st.session_state:
-            st.session_state.patient_facts = None
-        if 'application_status' not in st.session_state:
-            st.session_state.application_status = None
-        if 'eligibility_result' not in st.session_state:
-            st.session_state.eligibility_result = None
+        for key in _SESSION_KEYS:
+            st.session_state.setdefault(key, None)
 
     def run_expert_system(self):
         """
@@ -36,12 +136,17 @@ class CKDFinancialAidExpertSystem:
 
         # Step 1: Patient Information Input
         st.header("Step 1: Patient Information")
-        patient_description = st.text_area(
-            "Enter comprehensive patient description:",
-            placeholder="Example: 'Nimal Perera is a 45-year-old rural resident with CKD stage 3, working as a farmer with limited monthly income...'"
-        )
+        # Typing in the description does not rerun the page; only submitting does.
+        # The missing-information form opened by add_patient_information cannot
+        # be nested, so the submission is handled after this form closes.
+        with st.form("step1"):
+            patient_description = st.text_area(
+                "Enter comprehensive patient description:",
+                placeholder="Example: 'Nimal Perera is a 45-year-old rural resident with CKD stage 3, working as a farmer with limited monthly income...'"
+            )
+            submitted = st.form_submit_button("Process Patient Information")
 
-        if st.button("Process Patient Information"):
+        if submitted:
             if patient_description.strip():
                 try:
                     # Add patient information with interactive mode
@@ -51,15 +156,30 @@ class CKDFinancialAidExpertSystem:
                     )
 
                     # Extract patient name from facts
-                    patient_name = next(
-                        (fact.split('(')[1].split(')')[0] for fact in patient_facts if fact.startswith('person(')),
-                        None
-                    )
+                    patient_name = extract_person_name(patient_facts)
 
                     if patient_name:
-                        st.session_state.patient_name = patient_name
-                        st.session_state.patient_facts = patient_facts
-                        st.success(f"Patient {patient_name} information processed successfully!")
+                        # Load the new facts and assert the patient's eligibility report,
+                        # so the eligibility check is a lookup
+                        kb_path = self.knowledge_manager.knowledge_generator.prolog_file_path
+                        # Drops only this patient's precomputed report, along with the
+                        # generator's cached queries if it has been built
+                        self.denial_explainer.reload_knowledge_base(kb_path, names=[patient_name])
+                        failures = self.denial_explainer.precompute_eligibility([patient_name])
+
+                        if patient_name in failures:
+                            # Contained per person, so other patients are unaffected
+                            st.error(
+                                f"The facts recorded for {patient_name} are malformed and eligibility "
+                                f"cannot be evaluated: {failures[patient_name]}"
+                            )
+                        else:
+                            st.session_state.patient_name = patient_name
+                            # Results shown for a previous patient no longer apply
+                            st.session_state.eligibility_result = None
+                            st.session_state.application_status = None
+                            st.session_state.patient_facts = tuple(sys.intern(fact) for fact in patient_facts)
+                            st.success(f"Patient {patient_name} information processed successfully!")
                     else:
                         st.error("Could not extract patient name from description.")
 
@@ -76,50 +196,25 @@ class CKDFinancialAidExpertSystem:
             if st.button("Check Eligibility"):
                 try:
                     # Check patient eligibility
-                    eligibility_result = self.denial_explainer.analyze_eligibility(
-                        st.session_state.patient_name
+                    eligibility_result = _eligibility(
+                        st.session_state.patient_name,
+                        st.session_state.patient_facts
                     )
 
                     # Store eligibility result in session state
                     st.session_state.eligibility_result = eligibility_result
-                    st.session_state.application_status = eligibility_result['is_eligible']
+                    st.session_state.application_status = eligibility_result.is_eligible
 
-                    # Display overall eligibility status
-                    if eligibility_result['is_eligible']:
-                        st.success("Patient is ELIGIBLE for financial aid.")
+                    if eligibility_result.is_eligible:
                         st.balloons()  # Add a celebratory animation
-                    else:
-                        st.error("Patient is NOT fully eligible for financial aid.")
-
-                    # Eligible Programs Section
-                    st.subheader("Eligible Programs")
-                    if eligibility_result['eligible_programs']:
-                        for program in eligibility_result['eligible_programs']:
-                            st.markdown(f"✅ {program.replace('_', ' ').title()}")
-                    else:
-                        st.markdown("*No programs currently eligible*")
-
-                    # Non-Eligible Programs Section
-                    st.subheader("Non-Eligible Programs")
-                    if eligibility_result['non_eligible_programs']:
-                        for program in eligibility_result['non_eligible_programs']:
-                            st.markdown(f"❌ {program.replace('_', ' ').title()}")
-                    else:
-                        st.markdown("*All programs are eligible*")
-
-                    # Detailed Explanation Section
-                    st.subheader("Detailed Eligibility Explanation")
-                    st.info(eligibility_result['explanation'])
-
-                    # Optional: Denial Reasons
-                    if eligibility_result['denial_reasons']:
-                        st.subheader("Specific Denial Reasons")
-                        for reason in eligibility_result['denial_reasons']:
-                            st.markdown(f"🚫 {reason}")
 
                 except Exception as e:
                     st.error(f"Error checking eligibility: {e}")
 
+            # Shown on every rerun from session state, not only right after the click
+            if st.session_state.eligibility_result:
+                _render_eligibility(st.session_state.eligibility_result)
+
         # Step 3: Application Generation
         if st.session_state.application_status:
             st.header("Step 3: Application Generation")
@@ -127,45 +222,47 @@ class CKDFinancialAidExpertSystem:
             if st.button("Generate Financial Aid Application"):
                 try:
                     # Generate application
-                    result = self.application_generator.generate_application(
-                        st.session_state.patient_name
+                    result = _cached_application(
+                        st.session_state.patient_name,
+                        st.session_state.patient_facts
                     )
 
                     st.success("Application Generated Successfully!")
                     st.subheader("Application Details:")
-                    st.text_area(
-                        "Application Content:",
-                        value=result['application'],
-                        height=300,
-                        disabled=True
-                    )
+                    st.code(result['application'], language="markdown")
 
                 except Exception as e:
                     st.error(f"Error generating application: {e}")
 
+        # Sidebar interactions rerun only the sidebar fragment. Fragments cannot
+        # call st.sidebar themselves, so the fragment is rendered inside it.
+        with st.sidebar:
+            self._sidebar()
+
+    @st.fragment
+    def _sidebar(self):
+        """
+        System information sidebar
+        """
         # Optional: View Current Knowledge Base
-        st.sidebar.title("System Information")
-        if st.sidebar.button("View Knowledge Base"):
+        st.title("System Information")
+        if st.button("View Knowledge Base"):
             try:
-                with open(self.knowledge_manager.knowledge_generator.prolog_file_path, 'r') as f:
-                    knowledge_base = f.read()
-                    st.sidebar.text_area(
-                        "Knowledge Base Contents:",
-                        value=knowledge_base,
-                        height=400,
-                        disabled=True
-                    )
+                kb_path = self.knowledge_manager.knowledge_generator.prolog_file_path
+                knowledge_base = _read_kb(kb_path, os.path.getmtime(kb_path))
+                # Static render; nothing to keep in widget state
+                with st.expander("Knowledge Base Contents:", expanded=True):
+                    st.code(knowledge_base, language="prolog")
             except Exception as e:
-                st.sidebar.error(f"Error reading knowledge base: {e}")
+                st.error(f"Error reading knowledge base: {e}")
 
         # Reset System State Option
-        if st.sidebar.button("Reset Expert System"):
+        if st.button("Reset Expert System"):
             # Clear session state variables
-            for key in ['patient_name', 'patient_facts', 'application_status', 'eligibility_result']:
-                if key in st.session_state:
-                    del st.session_state[key]
+            for key in _SESSION_KEYS:
+                st.session_state.pop(key, None)
 
-            # Use st.rerun() instead of experimental_rerun()
+            # A full app rerun, so the main page reflects the cleared state
             st.rerun()
 
 def main():